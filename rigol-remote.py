@@ -1,8 +1,19 @@
 # -*- coding: utf-8 -*-
+import os
+import json
 import socket
 import asyncio
+import contextlib
 import base64
-from nicegui import ui
+import hashlib
+import re
+import queue
+import threading
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from nicegui import app, ui
 
 # Add global styles with a dark background (similar to ChatGPT dark mode)
 # and custom classes for buttons.
@@ -17,6 +28,14 @@ ui.add_head_html('''
     background-color: #00FFFF !important;
     color: black !important;
   }
+  .button-ch3 {
+    background-color: #FF00FF !important;
+    color: black !important;
+  }
+  .button-ch4 {
+    background-color: #2F8BFF !important;
+    color: black !important;
+  }
   .button-green {
     background-color: green !important;
     color: white !important;
@@ -76,6 +95,28 @@ ui.add_head_html('''
     padding: 15px 0;
     color: black !important;
   }
+  .meas3-size {
+    width: 100px;
+    height: 10px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    margin: 0; /* Eliminates any potential internal margins */
+    background-color: #FF00FF;
+    padding: 15px 0;
+    color: black !important;
+  }
+  .meas4-size {
+    width: 100px;
+    height: 10px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    margin: 0; /* Eliminates any potential internal margins */
+    background-color: #2F8BFF;
+    padding: 15px 0;
+    color: black !important;
+  }
   .vslider-size {
     width: 100px;
     height: 100px;
@@ -117,34 +158,125 @@ selected_port = None
 instrument_name = None
 
 run_state = False         # False = STOP, True = RUN
-channel1_state = False    # False = OFF, True = ON
-channel2_state = False
 run_stop_button = None    # Will be assigned later
-ch1_button = None         # Will be assigned later
-ch2_button = None         # Will be assigned later
+
+MAX_CHANNELS = 4          # The UI is built for the largest DS1000Z model
+channel_count = 2         # Detected from *IDN? on connection
+channel_states = {}       # Channel number -> False = OFF, True = ON
 
 yellow_rigol = "#F9FC53"
 blue_rigol = "#00FFFF"
+magenta_rigol = "#FF00FF"
+darkblue_rigol = "#2F8BFF"
 orange_rigol = "#E88632"
+channel_colors = {1: yellow_rigol, 2: blue_rigol, 3: magenta_rigol, 4: darkblue_rigol}
+
+# Measurement items shown for every channel: (SCPI item, label, unit, convert with unit prefix)
+MEASUREMENTS = [
+    ("FREQuency", "Freq", "Hz", True),
+    ("PERiod", "Period", "s", True),
+    ("VMIN", "V Min", "V", True),
+    ("VMAX", "V Max", "V", True),
+    ("PDUTy", "+Duty", "", False),
+]
 
 # Global UI elements (assigned later in the UI definition)
 instrument_label = None
-pos_ch1_input = None
-pos_ch2_input = None
 trigger_input = None
-meas_ch1_freq = None
-meas_ch1_period = None
-meas_ch1_vmin = None
-meas_ch1_vmax = None
-meas_ch1_pduty = None
-meas_ch2_freq = None
-meas_ch2_period = None
-meas_ch2_vmin = None
-meas_ch2_vmax = None
-meas_ch2_pduty = None
+channel_buttons = {}      # Channel number -> CHn toggle button
+pos_inputs = {}           # Channel number -> vertical offset input
+meas_labels = {}          # (channel number, SCPI item) -> measurement label
+channel_widgets = {}      # Channel number -> every widget belonging to that channel
 connection_status = None
 ip_input = None
 port_input = None
+worker_process_checkbox = None
+setup_name_input = None
+setup_select = None
+mask_tolerance_input = None
+mask_time_tolerance_input = None
+mask_button = None
+mask_stats_label = None
+decode_protocol_select = None
+decode_data_select = None
+decode_clock_select = None
+decode_miso_select = None
+decode_cs_select = None
+decode_mode_select = None
+decode_baud_input = None
+decode_threshold_input = None
+
+connection_state_label = None
+
+# Instrument I/O worker limits (seconds unless stated otherwise).
+IO_QUEUE_SIZE = 32              # pending jobs before new ones are rejected
+IO_COMMAND_DEADLINE = 10        # short commands and queries
+IO_TRANSFER_DEADLINE = 30       # screenshots and setup blobs
+IO_CAPTURE_DEADLINE = 180      # deep-memory (RAW) captures of up to 24 Mpts
+IO_FRAME_DEADLINE = 5           # single-trigger mask test frames
+HEALTH_CHECK_INTERVAL = 5
+HEALTH_CHECK_DEADLINE = 3
+RECONNECT_MAX_DELAY = 30
+
+# Last settings read from the instrument in one bulk query (see refresh_settings).
+scope_settings = {}
+# Last batch of waveforms read with acquire_waveforms: channel -> (preamble, raw samples).
+captured_waveforms = {}
+
+CANVAS_WIDTH = 800
+CANVAS_HEIGHT = 480
+RAW_CHUNK_POINTS = 250000      # largest :WAVeform:DATA? read in BYTE format
+SCREEN_CODES = 200             # BYTE codes spanning the 8 vertical divisions
+
+# Host-side mask testing: channel -> (preamble, lower, upper) envelopes in volts,
+# built from a golden frame, and the counters of the running test.
+MASK_TRIGGER_TIMEOUT = 1       # seconds to wait for a trigger before re-arming
+MASK_FAILURES_DIR = os.path.join(os.path.expanduser("~"), ".rigol-remote", "mask-failures")
+mask_envelopes = {}
+mask_running = False
+mask_stats = {"frames": 0, "passed": 0, "failed": 0, "violations": 0, "dropped": 0}
+mask_last_frame = {}
+mask_started = 0.0             # time.monotonic() at the start of the test
+mask_save_tasks = set()        # background saves of failing frames still running
+
+# Host-side protocol decoding of the deep-memory capture. Decoders yield symbol tables:
+# NumPy structured arrays with the sample range, time, kind, value and a flag that is
+# False on framing errors (UART) or missing acknowledges (I2C).
+SYMBOL_DTYPE = np.dtype([("start", np.int64), ("stop", np.int64), ("time", np.float64),
+                         ("kind", "U4"), ("value", np.int32), ("ok", np.bool_)])
+DECODE_BATCH = 65536           # symbols decoded per vectorized batch
+MAX_OVERLAY_SYMBOLS = 200      # labels drawn on the canvas at once
+UART_MIN_SAMPLES_PER_BIT = 3   # below this, mid-bit sampling cannot tell the bits apart
+decoded_symbols = np.zeros(0, dtype=SYMBOL_DTYPE)
+
+# Optional acquisition worker process: it fetches, parses and encodes the frames of the
+# instrument and publishes them into shared-memory rings read by the web process.
+PNG_RING_SLOTS = 4
+PNG_SLOT_SIZE = 1 << 20        # base64 data URL of one screen image
+WAVE_RING_SLOTS = 64
+WAVE_SLOT_SIZE = 1 << 16       # displayed waveforms of all channels
+PNG_PUBLISH_INTERVAL = 0.3     # the canvas shows one screen image every 0.3 s
+acquisition_process = None
+worker_failure = None          # shown with the connection state once the worker process died
+png_ring = None
+wave_ring = None
+worker_stop = None             # set to end the worker loop
+worker_single_shot = None      # set while a mask test needs single-trigger frames
+worker_channels = None         # shared flags of the enabled channels
+worker_pause = None            # set while the web process uses the waveform settings
+worker_idle = None             # set by the worker once it has paused
+last_png_sequence = 0
+
+# Deep-memory capture view: one min/max pyramid per captured channel and the
+# sample range currently drawn on the canvas instead of the live screen image.
+live_view = True
+capture_pyramids = {}
+capture_view = {"start": 0, "stop": 0}
+
+# Local content-addressed store for binary setup snapshots: every blob is saved
+# as <sha256>.bin and index.json maps the user-given names to those digests.
+SETUP_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".rigol-remote", "setups")
+SETUP_INDEX_FILE = os.path.join(SETUP_CACHE_DIR, "index.json")
 
 # --- Helper functions for socket communication ---
 
@@ -169,51 +301,173 @@ def socket_query_pair(cmd1, cmd2, timeout=30, recv_size=1024):
         resp2 = s.recv(recv_size)
         return resp1, resp2
 
+# --- Instrument I/O worker ---
+
+class InstrumentIOError(Exception):
+    """Raised when an instrument job is rejected or misses its deadline."""
+
+class InstrumentIO:
+    """
+    Runs the blocking socket calls of one instrument on a dedicated worker thread.
+    Jobs wait in a bounded queue and each one has a deadline, also passed to the job as
+    its socket timeout: jobs abandoned by their caller are skipped, and a worker stuck past
+    a deadline is replaced by a fresh one so that later commands do not queue behind a dead
+    connection, while the old one gives up on its socket shortly after.
+    """
+
+    def __init__(self, max_pending=IO_QUEUE_SIZE):
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.state = "disconnected"    # disconnected, connected or reconnecting
+        self.generation = 0
+        self.job_deadline = None       # monotonic deadline of the running job
+        self.start_worker()
+
+    def start_worker(self):
+        """Starts a new worker thread; any previous worker exits after its current job."""
+        self.generation += 1
+        self.job_deadline = None
+        threading.Thread(target=self.worker, args=(self.generation,), daemon=True).start()
+
+    def worker(self, generation):
+        """Executes queued jobs until a newer worker replaces this one."""
+        while generation == self.generation:
+            try:
+                future, func, args, deadline = self.jobs.get(timeout=1)
+            except queue.Empty:
+                continue
+            if future.done():
+                # The caller gave up (deadline or cancellation) before the job started.
+                continue
+            self.job_deadline = time.monotonic() + deadline
+            try:
+                result, error = func(*args, timeout=deadline), None
+            except Exception as e:
+                result, error = None, e
+            if generation == self.generation:
+                self.job_deadline = None
+            try:
+                future.get_loop().call_soon_threadsafe(self.resolve, future, result, error)
+            except RuntimeError:
+                pass  # The event loop is closed.
+
+    @staticmethod
+    def resolve(future, result, error):
+        """Hands the job outcome to the waiting coroutine, unless it already gave up."""
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def call(self, func, *args, deadline=IO_COMMAND_DEADLINE):
+        """
+        Runs func(*args, timeout=deadline) on the worker and returns its result,
+        waiting at most deadline seconds.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.jobs.put_nowait((future, func, args, deadline))
+        except queue.Full:
+            raise InstrumentIOError(f"I/O queue full, {func.__name__} rejected")
+        try:
+            return await asyncio.wait_for(future, deadline)
+        except asyncio.TimeoutError:
+            if self.job_deadline is not None and time.monotonic() > self.job_deadline:
+                print("Instrument I/O worker stuck, starting a new one")
+                self.start_worker()
+            raise InstrumentIOError(f"{func.__name__} exceeded its {deadline} s deadline")
+
+scope_io = InstrumentIO()
+
 # --- Core functions for oscilloscope control ---
 
-def check_connection(ip, port):
+def check_connection(ip, port, timeout=5):
     """Sends the *IDN? command to verify the connection and retrieve instrument information."""
     command = "*IDN?\n"
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(5)
+        s.settimeout(timeout)
         s.connect((ip, port))
         s.sendall(command.encode())
         response = s.recv(1024)
         return response.decode().strip() if response else "Unknown"
 
-def get_png_image():
+def recv_line(s):
+    """Reads a single newline-terminated response from the socket."""
+    data = bytearray()
+    while not data.endswith(b'\n'):
+        chunk = s.recv(1024)
+        if not chunk:
+            break
+        data.extend(chunk)
+    return bytes(data)
+
+def socket_query_many(commands, timeout=30):
+    """
+    Sends several queries over a single connection and returns their decoded responses.
+    Each command must be a query producing a single-line answer.
+    """
+    global selected_ip, selected_port
+    responses = []
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect((selected_ip, selected_port))
+        for command in commands:
+            s.sendall((command + "\n").encode())
+            responses.append(recv_line(s).decode().strip())
+    return responses
+
+def read_binary_block(s):
+    """
+    Reads a SCPI binary block (#<n><length><data>) from the socket and returns the data.
+    """
+    header = s.recv(2)
+    if len(header) < 2 or header[0:1] != b'#':
+        raise ValueError("Invalid header received")
+    try:
+        n_digits = int(header[1:2].decode())
+    except Exception as e:
+        raise ValueError("Unable to parse number of digits in header") from e
+    length_bytes = bytearray()
+    while len(length_bytes) < n_digits:
+        chunk = s.recv(n_digits - len(length_bytes))
+        if not chunk:
+            break
+        length_bytes.extend(chunk)
+    data_length = int(length_bytes.decode().lstrip("0") or "0")
+    # Receive straight into a preallocated buffer: deep-memory blocks are several MB.
+    data = bytearray(data_length)
+    view = memoryview(data)
+    received = 0
+    while received < data_length:
+        count = s.recv_into(view[received:], min(65536, data_length - received))
+        if not count:
+            break
+        received += count
+    if received < data_length:
+        raise ValueError("Incomplete binary block received")
+    return bytes(data)
+
+def make_binary_block(data):
+    """Wraps raw bytes into a SCPI definite-length binary block."""
+    length = str(len(data)).encode()
+    return b'#' + str(len(length)).encode() + length + data
+
+def get_png_image(timeout=IO_TRANSFER_DEADLINE):
     """
     Retrieves the PNG image from the oscilloscope in SCPI binary block format.
     """
     global selected_ip, selected_port
     command = ':DISPlay:DATA? ON,OFF,PNG\n'
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(60)
+        s.settimeout(timeout)
         s.connect((selected_ip, selected_port))
         s.sendall(command.encode())
-        header = s.recv(2)
-        if len(header) < 2 or header[0:1] != b'#':
-            raise ValueError("Invalid header received")
-        try:
-            n_digits = int(header[1:2].decode())
-        except Exception as e:
-            raise ValueError("Unable to parse number of digits in header") from e
-        length_bytes = bytearray()
-        while len(length_bytes) < n_digits:
-            chunk = s.recv(n_digits - len(length_bytes))
-            if not chunk:
-                break
-            length_bytes.extend(chunk)
-        data_length = int(length_bytes.decode().lstrip("0") or "0")
-        data = bytearray()
-        while len(data) < data_length:
-            chunk = s.recv(min(4096, data_length - len(data)))
-            if not chunk:
-                break
-            data.extend(chunk)
-        if len(data) < data_length:
-            raise ValueError("Incomplete PNG data received")
-        return bytes(data)
+        return read_binary_block(s)
+
+def query_opc(timeout=HEALTH_CHECK_DEADLINE):
+    """Lightweight health probe: returns True when the instrument answers *OPC?."""
+    return socket_query("*OPC?\n", timeout=timeout).decode().strip() == "1"
 
 def convert_png_data_to_data_url(data):
     """Converts binary PNG data into a data URL for display in the canvas."""
@@ -238,28 +492,21 @@ def convert_unit(value):
         return f'{value/1e9:.1f} G'
     return '*** '
 
-def send_command_to_scope(command):
+def send_command_to_scope(command, timeout=IO_COMMAND_DEADLINE):
     """Sends a specific command to the oscilloscope."""
     global selected_ip, selected_port
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(30)
+        s.settimeout(timeout)
         s.connect((selected_ip, selected_port))
         s.sendall((command + "\n").encode())
 
 async def send_command(command):
     """Sends a command to the oscilloscope asynchronously."""
     try:
-        await asyncio.to_thread(send_command_to_scope, command)
+        await scope_io.call(send_command_to_scope, command)
     except Exception as e:
         print(f"Failed to send command {command}: {e}")
 
-def query_channel_state(channel):
-    """Queries the specified channel state and returns True if active, False otherwise."""
-    command = f":CHANnel{channel}:DISPlay?\n"
-    response = socket_query(command, timeout=30)
-    state = response.decode().strip()
-    return state == "1"
-
 async def set_offset_manual(event):
     """Handles manual time offset setting on Enter key event."""
     if event.args.get('key') == 'Enter':
@@ -270,39 +517,30 @@ async def set_trigger_manual(event):
     if event.args.get('key') == 'Enter':
         await set_trigger(trigger_input.value)
 
-async def set_ch1_voltage_offset_manual(event):
-    """Handles manual CH1 voltage offset setting on Enter key event."""
-    if event.args.get('key') == 'Enter':
-        await set_voltage_offset(pos_ch1_input.value, 1)
-
-async def set_ch2_voltage_offset_manual(event):
-    """Handles manual CH2 voltage offset setting on Enter key event."""
+async def set_voltage_offset_manual(event, channel):
+    """Handles manual voltage offset setting of a channel on Enter key event."""
     if event.args.get('key') == 'Enter':
-        await set_voltage_offset(pos_ch2_input.value, 2)
-
-def query_offset_state():
-    """Queries the main timebase offset from the oscilloscope."""
-    response = socket_query(":TIMebase:MAIN:OFFSet?\n", timeout=30)
-    return float(response.decode().strip())
+        await set_voltage_offset(pos_inputs[channel].value, channel)
 
-def query_voltage_offset(channel):
-    """Queries the voltage offset for a given channel."""
-    response = socket_query(f":CHANnel{channel}:OFFSet?\n", timeout=30)
-    return float(response.decode().strip())
-
-def query_trigger():
-    """Queries the trigger level from the oscilloscope."""
-    response = socket_query(":TRIGger:EDGe:LEVel?\n", timeout=30)
-    return float(response.decode().strip())
+def detect_channel_count(idn):
+    """
+    Returns the number of analog channels from the model in the *IDN? answer,
+    e.g. DS1054Z and DS1104Z have 4 channels, DS1202Z-E has 2.
+    """
+    fields = idn.split(',')
+    model = fields[1] if len(fields) > 1 else idn
+    match = re.search(r'(?:DS|MSO)\d{3}(\d)Z', model)
+    if match:
+        return max(1, min(int(match.group(1)), MAX_CHANNELS))
+    return 2
 
-def query_meas(item, channel, conv=True):
+def format_meas(response, conv=True):
     """
-    Queries a measurement item from a specified channel.
+    Formats a measurement answer.
     Returns a converted value with unit if conv is True, otherwise a formatted string.
     """
-    response = socket_query(f":MEASure:ITEM? {item},CHANnel{channel}\n", timeout=30)
     try:
-        value = float(response.decode().strip())
+        value = float(response)
         if conv:
             return convert_unit(value)
         else:
@@ -311,55 +549,277 @@ def query_meas(item, channel, conv=True):
     except:
         return "*** "
 
-async def update_channel_states():
+def query_measurements(channels, timeout=IO_COMMAND_DEADLINE):
+    """
+    Queries every measurement item of the given channels with a single connection.
+    Returns a dictionary (channel, item) -> formatted value.
+    """
+    keys = [(channel, item) for channel in channels for item, _, _, _ in MEASUREMENTS]
+    commands = [f":MEASure:ITEM? {item},CHANnel{channel}" for channel, item in keys]
+    conversions = {item: conv for item, _, _, conv in MEASUREMENTS}
+    responses = socket_query_many(commands, timeout=timeout)
+    return {key: format_meas(response, conversions[key[1]]) for key, response in zip(keys, responses)}
+
+def parse_preamble(response):
+    """Parses the :WAVeform:PREamble? answer into a dictionary."""
+    fields = response.split(',')
+    return {
+        "format": int(fields[0]),
+        "type": int(fields[1]),
+        "points": int(fields[2]),
+        "count": int(fields[3]),
+        "xincrement": float(fields[4]),
+        "xorigin": float(fields[5]),
+        "xreference": float(fields[6]),
+        "yincrement": float(fields[7]),
+        "yorigin": float(fields[8]),
+        "yreference": float(fields[9]),
+    }
+
+def read_waveforms(s, channels, raw=False):
+    """
+    Reads the waveform of every given channel over an open connection: the displayed
+    points, or the whole acquisition memory if raw is True (the instrument must be stopped).
+    Returns a dictionary channel -> (preamble, uint8 samples).
+    """
+    waveforms = {}
+    mode = b"RAW" if raw else b"NORMal"
+    s.sendall(b":WAVeform:MODE " + mode + b"\n:WAVeform:FORMat BYTE\n")
+    for channel in channels:
+        s.sendall(f":WAVeform:SOURce CHANnel{channel}\n:WAVeform:PREamble?\n".encode())
+        preamble = parse_preamble(recv_line(s).decode().strip())
+        samples = np.empty(preamble["points"], dtype=np.uint8)
+        # The memory is read in chunks of at most RAW_CHUNK_POINTS samples.
+        for start in range(0, preamble["points"], RAW_CHUNK_POINTS):
+            stop = min(start + RAW_CHUNK_POINTS, preamble["points"])
+            s.sendall(f":WAVeform:STARt {start + 1}\n:WAVeform:STOP {stop}\n:WAVeform:DATA?\n".encode())
+            block = read_binary_block(s)
+            s.recv(1)  # Newline terminating the binary block
+            samples[start:start + len(block)] = np.frombuffer(block, dtype=np.uint8)
+        waveforms[channel] = (preamble, samples)
+    return waveforms
+
+def acquire_waveforms(channels, raw=False, timeout=IO_TRANSFER_DEADLINE):
+    """Reads the waveforms of the given channels in one batch over a single connection (see read_waveforms)."""
+    global selected_ip, selected_port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect((selected_ip, selected_port))
+        return read_waveforms(s, channels, raw)
+
+def acquire_single_frame(channels, trigger_timeout=MASK_TRIGGER_TIMEOUT, timeout=IO_FRAME_DEADLINE):
+    """
+    Arms a single acquisition, waits for the trigger and reads the displayed waveforms
+    of the given channels, all over one connection, so that every frame comes from a new
+    trigger. Triggers occurring while the frame is read and the scope re-armed are not seen.
+    Returns None if the scope did not re-arm and trigger within trigger_timeout seconds.
+    """
+    global selected_ip, selected_port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect((selected_ip, selected_port))
+        s.sendall(b":SINGle\n")
+        deadline = time.monotonic() + trigger_timeout
+        # The scope is still stopped on the previous frame until :SINGle takes effect:
+        # wait for it to leave STOP (WAIT, RUN or TD), then for the new trigger to stop it.
+        armed = False
+        while True:
+            s.sendall(b":TRIGger:STATus?\n")
+            stopped = recv_line(s).decode().strip() == "STOP"
+            if armed and stopped:
+                break
+            armed = armed or not stopped
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(0.002)
+        return read_waveforms(s, channels)
+
+def to_volts(preamble, samples):
+    """Converts BYTE samples to volts using the waveform preamble."""
+    return (samples.astype(np.float32) - (preamble["yorigin"] + preamble["yreference"])) * preamble["yincrement"]
+
+def query_settings(timeout=IO_COMMAND_DEADLINE):
     """
-    Updates the channel states by querying the instrument and updates the channel buttons accordingly.
+    Reads the instrument settings shown in the UI with a single connection
+    and returns them as a dictionary.
     """
-    global channel1_state, channel2_state, ch1_button, ch2_button
-    new_state1 = await asyncio.to_thread(query_channel_state, 1)
-    new_state2 = await asyncio.to_thread(query_channel_state, 2)
-    channel1_state = new_state1
-    channel2_state = new_state2
-    if channel1_state:
-        ch1_button.props['class'] = "button-size button-ch1"
+    channels = range(1, channel_count + 1)
+    commands = [f":CHANnel{channel}:DISPlay?" for channel in channels]
+    commands += [f":CHANnel{channel}:OFFSet?" for channel in channels]
+    commands += [":TRIGger:EDGe:LEVel?", ":TIMebase:MAIN:OFFSet?", ":TRIGger:STATus?"]
+    responses = socket_query_many(commands, timeout=timeout)
+    displays = responses[:channel_count]
+    offsets = responses[channel_count:2 * channel_count]
+    trigger_level, time_offset, trigger_status = responses[2 * channel_count:]
+    return {
+        "display": {channel: value == "1" for channel, value in zip(channels, displays)},
+        "offset": {channel: float(value) for channel, value in zip(channels, offsets)},
+        "trigger_level": float(trigger_level),
+        "time_offset": float(time_offset),
+        "running": trigger_status != "STOP",
+    }
+
+def update_channel_button(channel):
+    """Colors the channel button with the channel color when ON, grey when OFF."""
+    button = channel_buttons[channel]
+    if channel_states[channel]:
+        button.props['class'] = f"button-size button-ch{channel}"
     else:
-        ch1_button.props['class'] = "button-size button-grey"
-    ch1_button.update()
+        button.props['class'] = "button-size button-grey"
+    button.update()
 
-    if channel2_state:
-        ch2_button.props['class'] = "button-size button-ch2"
+def apply_settings_to_ui():
+    """Updates buttons and inputs from the cached instrument settings."""
+    global run_state
+    run_state = scope_settings["running"]
+    if run_state:
+        run_stop_button.props['class'] = "button-size button-green"
     else:
-        ch2_button.props['class'] = "button-size button-grey"
-    ch2_button.update()
+        run_stop_button.props['class'] = "button-size button-red"
+    run_stop_button.update()
+
+    for channel, state in scope_settings["display"].items():
+        channel_states[channel] = state
+        update_channel_button(channel)
+    update_worker_channels()
+    for channel, offset in scope_settings["offset"].items():
+        pos_inputs[channel].value = convert_unit(offset) + 'V'
+        pos_inputs[channel].update()
+    trigger_input.value = convert_unit(scope_settings["trigger_level"]) + 'V'
+    trigger_input.update()
+    offset_input.value = convert_unit(scope_settings["time_offset"]) + 's'
+    offset_input.update()
+
+def show_channels():
+    """Shows the widgets of the channels available on the instrument and hides the others."""
+    for channel, widgets in channel_widgets.items():
+        for widget in widgets:
+            widget.visible = channel <= channel_count
+
+async def refresh_settings():
+    """Refreshes the settings cache with one bulk read and updates the UI."""
+    global scope_settings
+    scope_settings = await scope_io.call(query_settings)
+    apply_settings_to_ui()
+
+# --- Setup snapshots ---
+
+def get_setup_blob(timeout=IO_TRANSFER_DEADLINE):
+    """Retrieves the complete instrument setup as a binary block."""
+    global selected_ip, selected_port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect((selected_ip, selected_port))
+        s.sendall(b":SYSTem:SETup?\n")
+        return read_binary_block(s)
+
+def send_setup_blob(blob, timeout=IO_TRANSFER_DEADLINE):
+    """Restores a setup with a single binary transfer and waits for the instrument to apply it."""
+    global selected_ip, selected_port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect((selected_ip, selected_port))
+        s.sendall(b":SYSTem:SETup " + make_binary_block(blob) + b"\n")
+        s.sendall(b"*OPC?\n")
+        recv_line(s)
+
+def load_setup_index():
+    """
+    Returns the mapping of setup names to blob digests, empty if no setup was saved yet.
+    A corrupted index raises ValueError instead, so that saving does not overwrite it.
+    """
+    try:
+        with open(SETUP_INDEX_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        raise ValueError(f"Setup index {SETUP_INDEX_FILE} is corrupted: {e}") from e
+
+def saved_setup_names():
+    """Returns the sorted names of the saved setups, or none if the index cannot be read."""
+    try:
+        return sorted(load_setup_index())
+    except ValueError as e:
+        print("Error loading setups:", e)
+        return []
+
+def store_setup(name, blob):
+    """Stores a setup blob under its SHA-256 digest and records it under the given name."""
+    os.makedirs(SETUP_CACHE_DIR, exist_ok=True)
+    digest = hashlib.sha256(blob).hexdigest()
+    blob_path = os.path.join(SETUP_CACHE_DIR, f"{digest}.bin")
+    if not os.path.exists(blob_path):
+        with open(blob_path, "wb") as f:
+            f.write(blob)
+    index = load_setup_index()
+    index[name] = digest
+    tmp_path = SETUP_INDEX_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, SETUP_INDEX_FILE)
+    return digest
+
+def load_setup(name):
+    """Returns the setup blob saved under the given name."""
+    digest = load_setup_index()[name]
+    with open(os.path.join(SETUP_CACHE_DIR, f"{digest}.bin"), "rb") as f:
+        blob = f.read()
+    if hashlib.sha256(blob).hexdigest() != digest:
+        raise ValueError(f"Setup '{name}' is corrupted")
+    return blob
+
+async def save_setup():
+    """Captures the current instrument setup and saves it under the typed name."""
+    name = setup_name_input.value.strip()
+    with display_container:
+        if not name:
+            ui.notify("Type a name for the setup")
+            return
+        try:
+            blob = await scope_io.call(get_setup_blob, deadline=IO_TRANSFER_DEADLINE)
+            digest = store_setup(name, blob)
+        except Exception as e:
+            print("Error saving setup:", e)
+            ui.notify(f"Error saving setup: {e}")
+            return
+        setup_select.options = sorted(load_setup_index())
+        setup_select.value = name
+        setup_select.update()
+        ui.notify(f"Setup '{name}' saved ({digest[:8]})")
+
+async def restore_setup():
+    """Restores the selected setup and refreshes the settings shown in the UI."""
+    name = setup_select.value
+    with display_container:
+        if not name:
+            ui.notify("Select a setup to restore")
+            return
+        try:
+            blob = load_setup(name)
+            await scope_io.call(send_setup_blob, blob, deadline=IO_TRANSFER_DEADLINE)
+            await refresh_settings()
+        except Exception as e:
+            print("Error restoring setup:", e)
+            ui.notify(f"Error restoring setup: {e}")
+            return
+        ui.notify(f"Setup '{name}' restored")
 
 async def auto_action():
     """
-    Sends the :AUToscale command; after a short delay, updates the channel states and sets the RUN state (button becomes green).
+    Sends the :AUToscale command; after a short delay, refreshes the settings (channel states, offsets and RUN state).
     """
-    global run_state, run_stop_button, pos_ch1_input, pos_ch2_input, trigger_input
     try:
-        await asyncio.to_thread(send_command_to_scope, ":AUToscale")
+        await scope_io.call(send_command_to_scope, ":AUToscale")
         # Wait for the instrument to update channel states
         await asyncio.sleep(1.0)
-        await update_channel_states()
-        run_state = True
-        run_stop_button.props['class'] = "button-size button-green"
-        run_stop_button.update()
-        val = await asyncio.to_thread(query_voltage_offset, 1)
-        pos_ch1_input.value = convert_unit(val) + 'V'
-        pos_ch1_input.update()
-        val = await asyncio.to_thread(query_voltage_offset, 2)
-        pos_ch2_input.value = convert_unit(val) + 'V'
-        pos_ch2_input.update()
-        val = await asyncio.to_thread(query_trigger)
-        trigger_input.value = convert_unit(val) + 'V'
-        trigger_input.update()
+        await refresh_settings()
     except Exception as e:
         print("Error sending :AUToscale:", e)
 
 async def on_connect():
     """Verifies the connection and starts data acquisition."""
-    global selected_ip, selected_port, instrument_name, run_state, run_stop_button, instrument_label, pos_ch1_input, pos_ch2_input, trigger_input, connection_status, ip_input, port_input
+    global selected_ip, selected_port, instrument_name, channel_count, run_state, run_stop_button, instrument_label, trigger_input, connection_status, ip_input, port_input
     loading_overlay.visible = True
     ip = ip_input.value.strip()
     try:
@@ -369,7 +829,7 @@ async def on_connect():
         loading_overlay.visible = False
         return
     try:
-        instrument = await asyncio.to_thread(check_connection, ip, port)
+        instrument = await scope_io.call(check_connection, ip, port)
     except Exception as e:
         connection_status.set_text(f"Connection failed: {e}")
         loading_overlay.visible = False
@@ -377,6 +837,8 @@ async def on_connect():
     selected_ip = ip
     selected_port = port
     instrument_name = instrument
+    channel_count = detect_channel_count(instrument_name)
+    show_channels()
     connection_status.set_text("Connection successful!")
     fields = instrument_name.split(',')
     if len(fields) == 4:
@@ -393,46 +855,106 @@ async def on_connect():
     instrument_label.visible = True
     display_container.visible = True
     loading_overlay.delete()
+    set_connection_state("connected")
 
     # Automatically send :RUN and update the RUN/STOP button to RUN (green)
     try:
-        await asyncio.to_thread(send_command_to_scope, ":RUN")
+        await scope_io.call(send_command_to_scope, ":RUN")
         run_state = True
         run_stop_button.props['class'] = "button-size button-green"
         run_stop_button.update()
     except Exception as e:
         print("Error initializing RUN:", e)
 
-    # Query channel states at startup.
-    await update_channel_states()
-
-    val = await asyncio.to_thread(query_voltage_offset, 1)
-    pos_ch1_input.value = convert_unit(val) + 'V'
-    pos_ch1_input.update()
-
-    val = await asyncio.to_thread(query_voltage_offset, 2)
-    pos_ch2_input.value = convert_unit(val) + 'V'
-    pos_ch2_input.update()
-
-    val = await asyncio.to_thread(query_trigger)
-    trigger_input.value = convert_unit(val) + 'V'
-    trigger_input.update()
+    # Read all the settings shown in the UI at startup.
+    try:
+        await refresh_settings()
+    except Exception as e:
+        print("Error reading settings:", e)
 
-    offset_input.value = convert_unit(await asyncio.to_thread(query_offset_state)) + 's'
-    offset_input.update()
+    if worker_process_checkbox.value:
+        start_acquisition_worker()
 
-    # Start a timer to periodically update the canvas
+    # Start a timer to periodically update the canvas and one to watch the connection
     with display_container:
         ui.timer(0.3, update_canvas)
+        ui.timer(HEALTH_CHECK_INTERVAL, health_check)
 
-async def update_canvas():
-    """Updates the canvas with the acquired PNG image."""
+def set_connection_state(state):
+    """Records the instrument connection state and shows it in the UI."""
+    scope_io.state = state
+    colors = {"connected": "lightgreen", "reconnecting": orange_rigol, "disconnected": "red"}
+    text = f"Connection: {state}"
+    if worker_failure:
+        text += f"\n{worker_failure}"
+    connection_state_label.set_text(text)
+    connection_state_label.style(f"color: {colors[state]};")
+
+async def health_check():
+    """
+    Probes the instrument with *OPC? and reconnects if it does not answer. Also falls
+    back to in-process polling if the acquisition worker process died.
+    """
+    if acquisition_process is not None and not acquisition_process.is_alive():
+        acquisition_worker_died()
+    if scope_io.state != "connected":
+        return
+    job_deadline = scope_io.job_deadline
+    if job_deadline is not None and time.monotonic() < job_deadline:
+        return  # A long job (transfer, capture, mask frame) is running within its deadline
+    if job_deadline is None and not scope_io.jobs.empty():
+        return  # The probe would only wait behind the queued jobs
+    if job_deadline is not None:
+        error = "I/O job running past its deadline"
+    else:
+        try:
+            if await scope_io.call(query_opc, deadline=HEALTH_CHECK_DEADLINE):
+                return
+            error = "unexpected *OPC? answer"
+        except Exception as e:
+            error = e
+    print(f"Health check failed: {error}")
+    await reconnect()
+
+async def reconnect():
+    """Retries *IDN? with exponential backoff until the instrument answers again."""
+    set_connection_state("reconnecting")
+    delay = 1
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await scope_io.call(check_connection, selected_ip, selected_port, deadline=HEALTH_CHECK_DEADLINE * 2)
+            break
+        except Exception as e:
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+            print(f"Reconnect failed: {e}; retrying in {delay} s")
+    set_connection_state("connected")
     try:
-        png_data = await asyncio.to_thread(get_png_image)
+        await refresh_settings()
     except Exception as e:
-        print(f"Error updating canvas: {e}")
+        print("Error reading settings:", e)
+
+async def update_canvas():
+    """Updates the canvas with the acquired PNG image (published by the worker process, if any)."""
+    global last_png_sequence
+    if scope_io.state != "connected" or not live_view:
         return
-    data_url = convert_png_data_to_data_url(png_data)
+    if acquisition_process is not None:
+        sequence = png_ring.sequence()
+        data = png_ring.read(sequence) if sequence != last_png_sequence else None
+        if data is None:
+            return
+        data_url = bytes(data).decode()
+        if not png_ring.valid(sequence):
+            return  # Overwritten while reading
+        last_png_sequence = sequence
+    else:
+        try:
+            png_data = await scope_io.call(get_png_image, deadline=IO_TRANSFER_DEADLINE)
+        except Exception as e:
+            print(f"Error updating canvas: {e}")
+            return
+        data_url = convert_png_data_to_data_url(png_data)
     js_code = f'''
     (function() {{
         let canvas = document.getElementById("myCanvas");
@@ -454,9 +976,13 @@ async def toggle_run_stop():
     otherwise sends :RUN and updates button to green.
     """
     global run_state, run_stop_button
+    if mask_running:
+        with display_container:
+            ui.notify("Stop the mask test first")
+        return
     if run_state:
         try:
-            await asyncio.to_thread(send_command_to_scope, ":STOP")
+            await scope_io.call(send_command_to_scope, ":STOP")
             run_state = False
             run_stop_button.props['class'] = "button-size button-red"
             run_stop_button.update()
@@ -464,7 +990,7 @@ async def toggle_run_stop():
             print("Error switching to STOP:", e)
     else:
         try:
-            await asyncio.to_thread(send_command_to_scope, ":RUN")
+            await scope_io.call(send_command_to_scope, ":RUN")
             run_state = True
             run_stop_button.props['class'] = "button-size button-green"
             run_stop_button.update()
@@ -472,40 +998,64 @@ async def toggle_run_stop():
             print("Error switching to RUN:", e)
 
 async def measurement():
-    """Performs measurements and updates the measurement display labels."""
+    """Measures all enabled channels in one batch and updates the measurement display labels."""
+    channels = [channel for channel in range(1, channel_count + 1) if channel_states.get(channel)]
     with display_container:
-        meas_ch1_freq.set_text(str(await asyncio.to_thread(query_meas, 'FREQuency', 1)) + 'Hz')
-        meas_ch1_freq.update()
-        meas_ch1_period.set_text(str(await asyncio.to_thread(query_meas, 'PERiod', 1)) + 's')
-        meas_ch1_period.update()
-        meas_ch1_vmin.set_text(str(await asyncio.to_thread(query_meas, 'VMIN', 1)) + 'V')
-        meas_ch1_vmin.update()
-        meas_ch1_vmax.set_text(str(await asyncio.to_thread(query_meas, 'VMAX', 1)) + 'V')
-        meas_ch1_vmax.update()
-        meas_ch1_pduty.set_text(str(await asyncio.to_thread(query_meas, 'PDUTy', 1, False)))
-        meas_ch1_pduty.update()
-        meas_ch2_freq.set_text(str(await asyncio.to_thread(query_meas, 'FREQuency', 2)) + 'Hz')
-        meas_ch2_freq.update()
-        meas_ch2_period.set_text(str(await asyncio.to_thread(query_meas, 'PERiod', 2)) + 's')
-        meas_ch2_period.update()
-        meas_ch2_vmin.set_text(str(await asyncio.to_thread(query_meas, 'VMIN', 2)) + 'V')
-        meas_ch2_vmin.update()
-        meas_ch2_vmax.set_text(str(await asyncio.to_thread(query_meas, 'VMAX', 2)) + 'V')
-        meas_ch2_vmax.update()
-        meas_ch2_pduty.set_text(str(await asyncio.to_thread(query_meas, 'PDUTy', 2, False)))
-        meas_ch2_pduty.update()
+        try:
+            values = await scope_io.call(query_measurements, channels)
+        except Exception as e:
+            print("Error reading measurements:", e)
+            return
+        units = {item: unit for item, _, unit, _ in MEASUREMENTS}
+        for (channel, item), label in meas_labels.items():
+            label.set_text(values[(channel, item)] + units[item] if (channel, item) in values else '')
+            label.update()
+
+async def capture():
+    """
+    Stops the acquisition, reads the whole memory of all enabled channels in one batch
+    and shows it on the canvas for zooming and panning.
+    """
+    global captured_waveforms, capture_pyramids, decoded_symbols, live_view, run_state
+    channels = [channel for channel in range(1, channel_count + 1) if channel_states.get(channel)]
+    with display_container:
+        if not channels:
+            ui.notify("No channel enabled")
+            return
+        if mask_running:
+            ui.notify("Stop the mask test first")
+            return
+        try:
+            async with worker_paused():
+                if run_state:
+                    await scope_io.call(send_command_to_scope, ":STOP")
+                    run_state = False
+                    run_stop_button.props['class'] = "button-size button-red"
+                    run_stop_button.update()
+                captured_waveforms = await scope_io.call(acquire_waveforms, channels, True, deadline=IO_CAPTURE_DEADLINE)
+        except Exception as e:
+            print("Error acquiring waveforms:", e)
+            return
+        capture_pyramids = await asyncio.to_thread(
+            lambda: {channel: MinMaxPyramid(samples) for channel, (_, samples) in captured_waveforms.items()})
+        points = len(next(iter(captured_waveforms.values()))[1])
+        capture_view["start"], capture_view["stop"] = 0, points
+        decoded_symbols = np.zeros(0, dtype=SYMBOL_DTYPE)  # They belonged to the previous record
+        live_view = False
+        render_capture_view()
+        ui.notify(f"Captured {points} points on " + ", ".join(f"CH{channel}" for channel in captured_waveforms))
 
 async def set_time(time_value):
     """Sets the time scale of the oscilloscope."""
     try:
-        await asyncio.to_thread(send_command_to_scope, f":TIMebase:MAIN:SCALe {time_value}")
+        await scope_io.call(send_command_to_scope, f":TIMebase:MAIN:SCALe {time_value}")
     except:
         print("Error setting time")
 
 async def set_offset(offset):
     """Sets the time offset of the oscilloscope."""
     try:
-        resp1, resp2 = socket_query_pair(":TIMEbase:MAIN:SCALe?\n", ":TIMebase:MAIN:OFFSet?\n", timeout=30)
+        resp1, resp2 = await scope_io.call(socket_query_pair, ":TIMEbase:MAIN:SCALe?\n", ":TIMebase:MAIN:OFFSet?\n")
         screen = float(resp1.decode().strip())
         curr_offset = float(resp2.decode().strip())
         screen_step = screen / 5
@@ -515,7 +1065,7 @@ async def set_offset(offset):
             curr_offset -= screen_step
         else:
             curr_offset = float(offset)
-        await asyncio.to_thread(send_command_to_scope, f":TIMebase:MAIN:OFFSet {curr_offset}")
+        await scope_io.call(send_command_to_scope, f":TIMebase:MAIN:OFFSet {curr_offset}")
         offset_input.value = f"{convert_unit(curr_offset)}s"
         offset_input.update()
     except:
@@ -526,7 +1076,7 @@ async def set_voltage_offset(offset, channel):
     try:
         cmd_scale = f":CHANnel{channel}:SCALe?\n"
         cmd_offset = f":CHANnel{channel}:OFFSet?\n"
-        resp1, resp2 = socket_query_pair(cmd_scale, cmd_offset, timeout=30)
+        resp1, resp2 = await scope_io.call(socket_query_pair, cmd_scale, cmd_offset)
         scale = float(resp1.decode().strip())
         curr_offset = float(resp2.decode().strip())
         if offset == '+':
@@ -535,20 +1085,16 @@ async def set_voltage_offset(offset, channel):
             curr_offset -= scale / 5
         else:
             curr_offset = float(offset)
-        await asyncio.to_thread(send_command_to_scope, f":CHANnel{channel}:OFFSet {curr_offset}")
-        if channel == 1:
-            pos_ch1_input.value = f"{convert_unit(curr_offset)}V"
-            pos_ch1_input.update()
-        elif channel == 2:
-            pos_ch2_input.value = f"{convert_unit(curr_offset)}V"
-            pos_ch2_input.update()
+        await scope_io.call(send_command_to_scope, f":CHANnel{channel}:OFFSet {curr_offset}")
+        pos_inputs[channel].value = f"{convert_unit(curr_offset)}V"
+        pos_inputs[channel].update()
     except:
         print("Error setting voltage offset")
 
 async def set_trigger(trig):
     """Sets the trigger level of the oscilloscope."""
     try:
-        resp1, resp2 = socket_query_pair(":CHANnel1:SCALe?\n", ":TRIGger:EDGe:LEVel?\n", timeout=30)
+        resp1, resp2 = await scope_io.call(socket_query_pair, ":CHANnel1:SCALe?\n", ":TRIGger:EDGe:LEVel?\n")
         scale = float(resp1.decode().strip())
         curr_trigger = float(resp2.decode().strip())
         if trig == '+':
@@ -557,7 +1103,7 @@ async def set_trigger(trig):
             curr_trigger -= scale / 5
         else:
             curr_trigger = float(trig)
-        await asyncio.to_thread(send_command_to_scope, f":TRIGger:EDGe:LEVel {curr_trigger}")
+        await scope_io.call(send_command_to_scope, f":TRIGger:EDGe:LEVel {curr_trigger}")
         trigger_input.value = f"{convert_unit(curr_trigger)}V"
         trigger_input.update()
     except:
@@ -566,51 +1112,798 @@ async def set_trigger(trig):
 async def set_voltage(volt, channel):
     """Sets the voltage scale for a given channel."""
     try:
-        await asyncio.to_thread(send_command_to_scope, f":CHANnel{channel}:SCALe {volt}")
+        await scope_io.call(send_command_to_scope, f":CHANnel{channel}:SCALe {volt}")
     except:
         print("Error setting voltage")
 
-async def toggle_channel(channel, button):
+async def toggle_channel(channel):
     """
     Toggles the specified channel.
     If the channel is off, sends the command to turn it ON and updates the button to its channel color;
     if it is on, sends the command to turn it OFF and updates the button to grey.
     """
-    global channel1_state, channel2_state
-    if channel == 1:
-        if channel1_state:
-            try:
-                await asyncio.to_thread(send_command_to_scope, ":CHANnel1:DISPlay OFF")
-                channel1_state = False
-                button.props['class'] = "button-size button-grey"
-                button.update()
-            except Exception as e:
-                print("Error turning CH1 off:", e)
-        else:
-            try:
-                await asyncio.to_thread(send_command_to_scope, ":CHANnel1:DISPlay ON")
-                channel1_state = True
-                button.props['class'] = "button-size button-ch1"
-                button.update()
-            except Exception as e:
-                print("Error turning CH1 on:", e)
-    elif channel == 2:
-        if channel2_state:
+    state = "OFF" if channel_states.get(channel) else "ON"
+    try:
+        await scope_io.call(send_command_to_scope, f":CHANnel{channel}:DISPlay {state}")
+        channel_states[channel] = state == "ON"
+        update_channel_button(channel)
+        update_worker_channels()
+    except Exception as e:
+        print(f"Error turning CH{channel} {state.lower()}:", e)
+
+def build_channel_controls(channel):
+    """Creates the toggle button, vertical scale menu and vertical offset control of a channel."""
+    color = channel_colors[channel]
+    button = ui.button(f"CH{channel}").classes("button-size button-grey")
+    button.on("click", lambda: asyncio.create_task(toggle_channel(channel)))
+    channel_buttons[channel] = button
+    with ui.dropdown_button(f'Scale CH{channel}', auto_close=False).props(f'style="text-transform:none; color: black !important; background-color: {color} !important; padding-right: 0px;"').classes("button-size") as scale_menu:
+        for unit, multiplier, values in (('mV', 0.001, (1, 2, 5, 10, 20, 50, 100, 200, 500)), ('V', 1, (1, 2, 5, 10))):
+            with ui.dropdown_button(unit, auto_close=True).props(f'style="text-transform:none; color: black !important; background-color: {color} !important;"'):
+                for value in values:
+                    ui.item(str(value), on_click=lambda value=value, unit=unit, multiplier=multiplier: (asyncio.create_task(set_voltage(value * multiplier, channel)), ui.notify(f'CH{channel} Scale set to {value} {unit}')))
+    with ui.column().style(f"gap: 10px; background-color: {color}; border-radius: 4px; height: 40px;") as offset_control:
+        ui.label(f'CH{channel} VOffset').style('color: black; font-size: 0.8rem').classes("slider-size pt-2")
+        with ui.row().style("gap: 0"):
+            ui.button('-', on_click=lambda: (asyncio.create_task(set_voltage_offset('-', channel)))).style(f"background-color: {color} !important;").classes("square-button")
+            pos_input = ui.input(value="").classes("middle-label").props('borderless').tooltip('Type voltage offset in volts without unit')
+            pos_input.on('keyup', lambda event: set_voltage_offset_manual(event, channel))
+            ui.button('+', on_click=lambda: (asyncio.create_task(set_voltage_offset('+', channel)))).style(f"background-color: {color} !important;").classes("square-button")
+    pos_inputs[channel] = pos_input
+    channel_widgets.setdefault(channel, []).extend([button, scale_menu, offset_control])
+
+def build_channel_measurements(channel):
+    """Creates the measurement labels of a channel."""
+    for item, name, _, _ in MEASUREMENTS:
+        with ui.column() as column:
+            ui.label(f'CH{channel} {name}').style('color: white; font-size: 0.8rem').classes("slider-size")
+            meas_labels[(channel, item)] = ui.label('').style('color: white; font-size: 0.8rem').classes(f"meas{channel}-size")
+        channel_widgets.setdefault(channel, []).append(column)
+
+# --- Deep-memory capture view ---
+
+class MinMaxPyramid:
+    """
+    Min/max decimation pyramid of one waveform. Level k holds the minimum and maximum
+    of every block of 2**k samples, so any view of the record can be drawn from at most
+    two buckets per canvas column, whatever the record length.
+    """
+
+    def __init__(self, samples):
+        self.length = len(samples)
+        self.levels = [(samples, samples)]
+        mins = maxs = samples
+        # Each level halves the previous one, so the whole pyramid costs about 2N operations.
+        while len(mins) > 1:
+            if len(mins) % 2:
+                mins = np.append(mins, mins[-1])
+                maxs = np.append(maxs, maxs[-1])
+            mins = np.minimum(mins[0::2], mins[1::2])
+            maxs = np.maximum(maxs[0::2], maxs[1::2])
+            self.levels.append((mins, maxs))
+
+    def view(self, start, stop, width):
+        """Returns the per-column minimum and maximum of samples[start:stop] on at most width columns."""
+        span = stop - start
+        level = 0
+        while level + 1 < len(self.levels) and span >> (level + 1) >= width:
+            level += 1
+        mins, maxs = self.levels[level]
+        first = start >> level
+        last = max(first + 1, -(-stop >> level))
+        mins, maxs = mins[first:last], maxs[first:last]
+        columns = min(width, len(mins))
+        edges = (np.arange(columns) * len(mins)) // columns
+        return np.minimum.reduceat(mins, edges), np.maximum.reduceat(maxs, edges)
+
+def codes_to_pixels(codes, preamble):
+    """Maps BYTE codes (centered on yreference, SCREEN_CODES over the canvas height) to canvas rows."""
+    rows = CANVAS_HEIGHT / 2 - (np.asarray(codes, dtype=np.float32) - preamble["yreference"]) * (CANVAS_HEIGHT / SCREEN_CODES)
+    return np.clip(rows, 0, CANVAS_HEIGHT - 1).astype(int)
+
+def draw_traces(traces, caption, labels=()):
+    """
+    Draws traces on the canvas over a 12x8 grid. Each trace is a dictionary with a color
+    and the top and bottom rows of every column, spread over the canvas width.
+    Labels are (x, text, color) tuples drawn as boxes along the bottom edge.
+    """
+    js_code = f'''
+    (function() {{
+        let canvas = document.getElementById("myCanvas");
+        if (!canvas) return;
+        let ctx = canvas.getContext("2d");
+        ctx.fillStyle = "#000";
+        ctx.fillRect(0, 0, canvas.width, canvas.height);
+        ctx.strokeStyle = "#333";
+        ctx.beginPath();
+        for (let i = 1; i < 12; i++) {{ let x = i * canvas.width / 12; ctx.moveTo(x, 0); ctx.lineTo(x, canvas.height); }}
+        for (let i = 1; i < 8; i++) {{ let y = i * canvas.height / 8; ctx.moveTo(0, y); ctx.lineTo(canvas.width, y); }}
+        ctx.stroke();
+        for (const trace of {json.dumps(traces)}) {{
+            let step = canvas.width / trace.top.length;
+            ctx.strokeStyle = trace.color;
+            ctx.beginPath();
+            for (let i = 0; i < trace.top.length; i++) {{
+                let x = (i + 0.5) * step;
+                ctx.moveTo(x, trace.top[i]);
+                ctx.lineTo(x, trace.bottom[i] + 1);
+            }}
+            ctx.stroke();
+        }}
+        ctx.font = "11px monospace";
+        let row = 0;
+        for (const [x, text, color] of {json.dumps(list(labels))}) {{
+            let y = canvas.height - 20 - 16 * (row++ % 3);
+            ctx.strokeStyle = color;
+            ctx.strokeRect(x, y, ctx.measureText(text).width + 4, 14);
+            ctx.fillStyle = color;
+            ctx.fillText(text, x + 2, y + 11);
+        }}
+        ctx.fillStyle = "white";
+        ctx.font = "14px sans-serif";
+        ctx.fillText({json.dumps(caption)}, 10, 20);
+    }})();
+    '''
+    ui.run_javascript(js_code)
+
+def render_capture_view():
+    """Draws the visible part of the captured waveforms on the canvas."""
+    start, stop = capture_view["start"], capture_view["stop"]
+    traces = []
+    for channel, pyramid in capture_pyramids.items():
+        preamble = captured_waveforms[channel][0]
+        mins, maxs = pyramid.view(start, stop, CANVAS_WIDTH)
+        traces.append({
+            "color": channel_colors[channel],
+            "top": codes_to_pixels(maxs, preamble).tolist(),
+            "bottom": codes_to_pixels(mins, preamble).tolist(),
+        })
+    xincrement = next(iter(captured_waveforms.values()))[0]["xincrement"]
+    caption = f"{convert_unit((stop - start) * xincrement)}s shown, {stop - start} of {next(iter(capture_pyramids.values())).length} points"
+    draw_traces(traces, caption, symbol_labels(start, stop))
+
+def zoom_capture(factor):
+    """Zooms the capture view around its center (factor < 1 zooms in)."""
+    if live_view or not capture_pyramids:
+        return
+    length = next(iter(capture_pyramids.values())).length
+    start, stop = capture_view["start"], capture_view["stop"]
+    span = min(length, max(CANVAS_WIDTH // 8, int((stop - start) * factor)))
+    center = (start + stop) // 2
+    start = min(max(0, center - span // 2), length - span)
+    capture_view["start"], capture_view["stop"] = start, start + span
+    render_capture_view()
+
+def pan_capture(fraction):
+    """Pans the capture view by a fraction of the visible span."""
+    if live_view or not capture_pyramids:
+        return
+    length = next(iter(capture_pyramids.values())).length
+    start, stop = capture_view["start"], capture_view["stop"]
+    span = stop - start
+    start = min(max(0, start + int(span * fraction)), length - span)
+    capture_view["start"], capture_view["stop"] = start, start + span
+    render_capture_view()
+
+def show_live():
+    """Returns the canvas to the live screen image."""
+    global live_view
+    live_view = True
+
+# --- Mask (pass/fail) testing ---
+
+def build_mask(golden, tolerance, time_tolerance=0):
+    """
+    Builds the lower and upper envelopes of a golden waveform (in volts): the running
+    min/max over +/- time_tolerance samples, widened by tolerance volts.
+    """
+    if time_tolerance > 0:
+        padded = np.pad(golden, time_tolerance, mode="edge")
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * time_tolerance + 1)
+        lower, upper = windows.min(axis=1), windows.max(axis=1)
+    else:
+        lower, upper = golden, golden
+    return (lower - tolerance).astype(np.float32), (upper + tolerance).astype(np.float32)
+
+def check_mask(frame):
+    """Returns the number of samples of each channel of the frame lying outside its envelope."""
+    violations = {}
+    for channel, (preamble, samples) in frame.items():
+        _, lower, upper = mask_envelopes[channel]
+        if len(samples) != len(lower):
+            raise ValueError(f"CH{channel} has {len(samples)} points, the mask has {len(lower)}")
+        volts = to_volts(preamble, samples)
+        violations[channel] = int(np.count_nonzero((volts < lower) | (volts > upper)))
+    return violations
+
+def save_failed_frame(frame, index):
+    """Saves a failing frame with its envelopes as a compressed .npz file."""
+    os.makedirs(MASK_FAILURES_DIR, exist_ok=True)
+    arrays = {}
+    for channel, (preamble, samples) in frame.items():
+        _, lower, upper = mask_envelopes[channel]
+        arrays[f"ch{channel}"] = to_volts(preamble, samples)
+        arrays[f"ch{channel}_lower"] = lower
+        arrays[f"ch{channel}_upper"] = upper
+        arrays[f"ch{channel}_xincrement"] = preamble["xincrement"]
+    path = os.path.join(MASK_FAILURES_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{index:06d}.npz")
+    np.savez_compressed(path, **arrays)
+
+def save_task_done(task):
+    """Forgets a finished save task and reports its error, if any."""
+    mask_save_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print("Error saving failed frame:", task.exception())
+
+async def set_golden():
+    """Builds the mask envelopes from the current waveforms of the enabled channels."""
+    global mask_envelopes
+    channels = [channel for channel in range(1, channel_count + 1) if channel_states.get(channel)]
+    with display_container:
+        try:
+            tolerance = float(mask_tolerance_input.value)
+            time_tolerance = int(mask_time_tolerance_input.value or 0)
+        except ValueError:
+            ui.notify("Invalid mask tolerance")
+            return
+        if not channels:
+            ui.notify("No channel enabled")
+            return
+        if mask_running:
+            ui.notify("Stop the mask test first")
+            return
+        try:
+            async with worker_paused():
+                golden = await scope_io.call(acquire_waveforms, channels, deadline=IO_TRANSFER_DEADLINE)
+        except Exception as e:
+            print("Error acquiring golden waveform:", e)
+            return
+        mask_envelopes = {
+            channel: (preamble, *build_mask(to_volts(preamble, samples), tolerance, time_tolerance))
+            for channel, (preamble, samples) in golden.items()
+        }
+        ui.notify("Mask set on " + ", ".join(f"CH{channel}" for channel in mask_envelopes))
+
+async def next_ring_frame(channels, sequence):
+    """
+    Waits for the waveform frame with the given sequence number in the worker ring and
+    returns it as zero-copy views, or None if it was overwritten before being read or
+    the mask test or the worker process was stopped while waiting.
+    """
+    while wave_ring.sequence() < sequence:
+        if not mask_running or acquisition_process is None:
+            return None
+        await asyncio.sleep(0.005)
+    data = wave_ring.read(sequence)
+    if data is None:
+        return None
+    frame = unpack_waveforms(data)
+    if not set(channels) <= set(frame):
+        return {}
+    return {channel: frame[channel] for channel in channels}
+
+async def mask_test_loop():
+    """
+    Acquires single-trigger frames and checks each one against the mask until stopped.
+    Checking is vectorized and failing frames are saved in the background, so the
+    loop keeps pace with the acquisitions. With a worker process the frames are read
+    in order from its shared-memory ring; frames overwritten before being checked are
+    counted as dropped.
+    """
+    global mask_running, mask_last_frame, live_view
+    channels = list(mask_envelopes)
+    if acquisition_process is not None:
+        worker_single_shot.set()
+        sequence = wave_ring.sequence() + 1
+    try:
+        while mask_running:
+            if acquisition_process is not None:
+                if wave_ring.sequence() - sequence >= wave_ring.slots - 1:
+                    mask_stats["dropped"] += wave_ring.sequence() - sequence
+                    sequence = wave_ring.sequence()
+                frame = await next_ring_frame(channels, sequence)
+                sequence += 1
+                if frame is None:
+                    if mask_running and acquisition_process is not None:
+                        mask_stats["dropped"] += 1
+                    continue
+                if not frame:
+                    continue  # Published before all the mask channels were enabled
+            else:
+                try:
+                    frame = await scope_io.call(acquire_single_frame, channels, deadline=IO_FRAME_DEADLINE)
+                except Exception as e:
+                    print("Error acquiring mask test frame:", e)
+                    await asyncio.sleep(1)
+                    continue
+                if frame is None:
+                    continue  # No trigger yet, re-arm
             try:
-                await asyncio.to_thread(send_command_to_scope, ":CHANnel2:DISPlay OFF")
-                channel2_state = False
-                button.props['class'] = "button-size button-grey"
-                button.update()
-            except Exception as e:
-                print("Error turning CH2 off:", e)
+                violations = check_mask(frame)
+            except ValueError as e:
+                print("Mask test stopped:", e)
+                with display_container:
+                    ui.notify(f"Mask test stopped: {e}")
+                break
+            if acquisition_process is not None:
+                # Frames kept after the check must not point into the ring: copy them
+                # first, then make sure the slot was not reused during the check or the copy.
+                frame = {channel: (preamble, samples.copy()) for channel, (preamble, samples) in frame.items()}
+                if not wave_ring.valid(sequence - 1):
+                    mask_stats["dropped"] += 1
+                    continue  # Overwritten while being checked
+            mask_stats["frames"] += 1
+            total = sum(violations.values())
+            if total:
+                mask_stats["failed"] += 1
+                mask_stats["violations"] += total
+                task = asyncio.create_task(asyncio.to_thread(save_failed_frame, frame, mask_stats["frames"]))
+                mask_save_tasks.add(task)
+                task.add_done_callback(save_task_done)
+            else:
+                mask_stats["passed"] += 1
+            mask_last_frame = frame
+    finally:
+        if acquisition_process is not None:
+            worker_single_shot.clear()
+        mask_running = False
+        live_view = True
+        mask_button.props['class'] = "button-size button-grey"
+        mask_button.update()
+    # :SINGle leaves the instrument stopped: show its actual RUN/STOP state.
+    try:
+        await refresh_settings()
+    except Exception as e:
+        print("Error reading settings:", e)
+
+def toggle_mask_test():
+    """Starts the mask test with cleared counters, or stops it."""
+    global mask_running, mask_started, live_view
+    if mask_running:
+        mask_running = False
+        return
+    if not mask_envelopes:
+        ui.notify("Set the golden waveform first")
+        return
+    for key in mask_stats:
+        mask_stats[key] = 0
+    mask_running = True
+    mask_started = time.monotonic()
+    live_view = False
+    mask_button.props['class'] = "button-size button-green"
+    mask_button.update()
+    asyncio.create_task(mask_test_loop())
+
+def update_mask_display():
+    """Shows the mask counters and draws the last tested frame with its envelopes."""
+    mask_stats_label.set_text(
+        f"Frames: {mask_stats['frames']}  Pass: {mask_stats['passed']}  "
+        f"Fail: {mask_stats['failed']}  Violations: {mask_stats['violations']}"
+        + (f"  Rate: {mask_stats['frames'] / max(time.monotonic() - mask_started, 1e-3):.1f} frames/s" if mask_running else "")
+        + (f"  Dropped: {mask_stats['dropped']}" if acquisition_process is not None else "")
+    )
+    if not mask_running or not mask_last_frame:
+        return
+    traces = []
+    for channel, (preamble, samples) in mask_last_frame.items():
+        _, lower, upper = mask_envelopes[channel]
+        for envelope in (lower, upper):
+            # Envelopes are in volts: back to BYTE codes for drawing.
+            codes = envelope / preamble["yincrement"] + preamble["yorigin"] + preamble["yreference"]
+            mins, maxs = MinMaxPyramid(codes).view(0, len(codes), CANVAS_WIDTH)
+            traces.append({"color": "#FF4040", "top": codes_to_pixels(maxs, preamble).tolist(), "bottom": codes_to_pixels(mins, preamble).tolist()})
+        mins, maxs = MinMaxPyramid(samples).view(0, len(samples), CANVAS_WIDTH)
+        traces.append({"color": channel_colors[channel], "top": codes_to_pixels(maxs, preamble).tolist(), "bottom": codes_to_pixels(mins, preamble).tolist()})
+    draw_traces(traces, f"Mask test: {mask_stats['failed']} failed of {mask_stats['frames']} frames")
+
+# --- Protocol decoding ---
+
+def to_logic(preamble, samples, threshold=None):
+    """
+    Thresholds BYTE samples into a boolean array. The threshold is given in volts,
+    or defaults to the midpoint between the lowest and highest sample.
+    """
+    if threshold is None:
+        code = (int(samples.min()) + int(samples.max())) / 2
+    else:
+        code = threshold / preamble["yincrement"] + preamble["yorigin"] + preamble["yreference"]
+    return samples > code
+
+def rising_edges(logic):
+    """Returns the indices of the first high sample of every low-to-high transition."""
+    return np.flatnonzero(~logic[:-1] & logic[1:]) + 1
+
+def falling_edges(logic):
+    """Returns the indices of the first low sample of every high-to-low transition."""
+    return np.flatnonzero(logic[:-1] & ~logic[1:]) + 1
+
+def make_symbols(start, stop, kind, value, ok):
+    """Builds a symbol table from equally long arrays (kind may be a single string)."""
+    table = np.zeros(len(start), dtype=SYMBOL_DTYPE)
+    table["start"], table["stop"], table["kind"], table["value"], table["ok"] = start, stop, kind, value, ok
+    return table
+
+def bits_to_values(bits, msb_first=True):
+    """Packs the rows of a 0/1 matrix into integers."""
+    weights = 1 << np.arange(bits.shape[1])
+    if msb_first:
+        weights = weights[::-1]
+    return bits.astype(np.int64) @ weights
+
+def group_ordinals(segments):
+    """Returns the position of every element within its run of equal (sorted) segment ids."""
+    _, first, inverse = np.unique(segments, return_index=True, return_inverse=True)
+    return np.arange(len(segments)) - first[inverse]
+
+def decode_uart(data, samples_per_bit, bits=8):
+    """
+    Decodes UART frames (idle high, 1 start bit, LSB first, no parity, 1 stop bit).
+    Yields symbol tables of DATA frames; ok is False when the stop bit is low.
+    """
+    frame_length = (bits + 2) * samples_per_bit
+    starts = falling_edges(data)
+    starts = starts[starts + frame_length < len(data)]
+    # A start bit can only follow the end of the previous frame: follow the chain of
+    # "next falling edge after this frame", computed for every candidate at once.
+    following = np.searchsorted(starts, starts + (bits + 1.5) * samples_per_bit)
+    keep = []
+    i = 0
+    while i < len(starts):
+        keep.append(i)
+        i = following[i]
+    starts = starts[keep]
+    offsets = ((np.arange(1, bits + 2) + 0.5) * samples_per_bit).astype(np.int64)
+    for batch in range(0, len(starts), DECODE_BATCH):
+        frame_starts = starts[batch:batch + DECODE_BATCH]
+        sampled = data[frame_starts[:, None] + offsets[None, :]]
+        values = bits_to_values(sampled[:, :bits], msb_first=False)
+        yield make_symbols(frame_starts, frame_starts + int(frame_length), "DATA", values, sampled[:, bits])
+
+def decode_i2c(sda, scl):
+    """
+    Decodes I2C transfers. Yields symbol tables of START/STOP conditions and of
+    ADDR/DATA bytes sampled on the SCL rising edges; ok is False on a missing ACK.
+    """
+    sda_falls, sda_rises = falling_edges(sda), rising_edges(sda)
+    conditions_start = sda_falls[scl[sda_falls]]
+    conditions_stop = sda_rises[scl[sda_rises]]
+    yield make_symbols(conditions_start, conditions_start, "S", 0, True)
+    yield make_symbols(conditions_stop, conditions_stop, "P", 0, True)
+    clocks = rising_edges(scl)
+    # Keep the clocks that follow a START with no STOP in between (-1 stands for "none yet").
+    segment = np.searchsorted(conditions_start, clocks, side="right")
+    last_start = np.concatenate(([-1], conditions_start))[segment]
+    last_stop = np.concatenate(([-1], conditions_stop))[np.searchsorted(conditions_stop, clocks, side="right")]
+    valid = (last_start >= 0) & (last_start > last_stop)
+    clocks, segment = clocks[valid], segment[valid]
+    # Every byte is 8 data bits (MSB first) followed by the ACK bit.
+    ordinal = group_ordinals(segment)
+    complete = (ordinal // 9) < (np.bincount(segment)[segment] // 9)
+    clocks, segment, ordinal = clocks[complete], segment[complete], ordinal[complete]
+    bits = sda[clocks].reshape(-1, 9)
+    byte_clocks = clocks.reshape(-1, 9)
+    first_byte = (ordinal.reshape(-1, 9)[:, 0] == 0)
+    for batch in range(0, len(bits), DECODE_BATCH):
+        rows = slice(batch, batch + DECODE_BATCH)
+        values = bits_to_values(bits[rows, :8])
+        kinds = np.where(first_byte[rows], "ADDR", "DATA")
+        yield make_symbols(byte_clocks[rows, 0], byte_clocks[rows, 8], kinds, values, ~bits[rows, 8])
+
+def decode_spi(sclk, mosi, miso=None, cs=None, mode=0, bits=8):
+    """
+    Decodes SPI words (MSB first) sampled on the clock edge of the given mode, grouped
+    by chip select (active low) when given. Yields symbol tables of MOSI and MISO words.
+    """
+    edges = rising_edges(sclk) if mode in (0, 3) else falling_edges(sclk)
+    if cs is not None:
+        edges = edges[~cs[edges]]
+        segment = np.searchsorted(falling_edges(cs), edges, side="right")
+    else:
+        segment = np.zeros(len(edges), dtype=np.int64)
+    ordinal = group_ordinals(segment)
+    complete = (ordinal // bits) < (np.bincount(segment)[segment] // bits)
+    word_edges = edges[complete].reshape(-1, bits)
+    for batch in range(0, len(word_edges), DECODE_BATCH):
+        rows = word_edges[batch:batch + DECODE_BATCH]
+        yield make_symbols(rows[:, 0], rows[:, -1], "MOSI", bits_to_values(mosi[rows]), True)
+        if miso is not None:
+            yield make_symbols(rows[:, 0], rows[:, -1], "MISO", bits_to_values(miso[rows]), True)
+
+def decode_capture(protocol, channels, threshold=None, baud=9600, spi_mode=0):
+    """
+    Decodes the deep-memory capture and returns the timestamped symbol table sorted by time.
+    channels maps the signal roles (data, clock, miso, cs) to channel numbers.
+    """
+    logic = {}
+    for role, channel in channels.items():
+        if channel is None:
+            continue
+        if channel not in captured_waveforms:
+            raise ValueError(f"CH{channel} is not in the capture")
+        preamble, samples = captured_waveforms[channel]
+        logic[role] = to_logic(preamble, samples, threshold)
+    preamble = captured_waveforms[next(channel for channel in channels.values() if channel is not None)][0]
+    if protocol == "UART":
+        if baud <= 0:
+            raise ValueError("The baud rate must be positive")
+        samples_per_bit = 1 / (baud * preamble["xincrement"])
+        if samples_per_bit < UART_MIN_SAMPLES_PER_BIT:
+            raise ValueError(f"{baud:g} Bd is too fast for the capture sample rate of "
+                             f"{convert_unit(1 / preamble['xincrement'])}Sa/s "
+                             f"(at least {UART_MIN_SAMPLES_PER_BIT} samples per bit needed)")
+        batches = decode_uart(logic["data"], samples_per_bit)
+    elif protocol == "I2C":
+        batches = decode_i2c(logic["data"], logic["clock"])
+    else:
+        batches = decode_spi(logic["clock"], logic["data"], logic.get("miso"), logic.get("cs"), spi_mode)
+    table = np.concatenate([np.zeros(0, dtype=SYMBOL_DTYPE), *batches])
+    table = table[np.argsort(table["start"], kind="stable")]
+    table["time"] = preamble["xorigin"] + table["start"] * preamble["xincrement"]
+    return table
+
+def format_symbol(symbol):
+    """Returns the overlay text of a decoded symbol."""
+    kind = str(symbol["kind"])
+    if kind in ("S", "P"):
+        return kind
+    text = f"{int(symbol['value']):02X}"
+    if kind == "ADDR":
+        text = f"A:{int(symbol['value']) >> 1:02X}{'R' if symbol['value'] & 1 else 'W'}"
+    elif kind == "MISO":
+        text = "<" + text
+    return text if symbol["ok"] else text + "!"
+
+def symbol_labels(start, stop):
+    """Returns the overlay labels of the decoded symbols inside the visible sample range."""
+    first, last = np.searchsorted(decoded_symbols["start"], [start, stop])
+    if last - first > MAX_OVERLAY_SYMBOLS:
+        return [(CANVAS_WIDTH // 2 - 80, f"{last - first} symbols, zoom in", "white")]
+    scale = CANVAS_WIDTH / max(1, stop - start)
+    return [
+        (int((symbol["start"] - start) * scale), format_symbol(symbol), "#FF4040" if not symbol["ok"] else "white")
+        for symbol in decoded_symbols[first:last]
+    ]
+
+async def decode():
+    """Decodes the capture with the selected protocol and shows the symbols over it."""
+    global decoded_symbols
+    with display_container:
+        if not captured_waveforms:
+            ui.notify("CAPTURE the signals first")
+            return
+        try:
+            threshold = float(decode_threshold_input.value) if decode_threshold_input.value.strip() else None
+            baud = float(decode_baud_input.value)
+        except ValueError:
+            ui.notify("Invalid threshold or baud rate")
+            return
+        channels = {"data": decode_data_select.value, "clock": decode_clock_select.value,
+                    "miso": decode_miso_select.value, "cs": decode_cs_select.value}
+        if channels["data"] is None or (decode_protocol_select.value != "UART" and channels["clock"] is None):
+            ui.notify("Select the data and clock channels")
+            return
+        if decode_protocol_select.value == "UART":
+            channels = {"data": channels["data"]}
+        elif decode_protocol_select.value == "I2C":
+            channels = {"data": channels["data"], "clock": channels["clock"]}
+        started = time.perf_counter()
+        try:
+            decoded_symbols = await asyncio.to_thread(
+                decode_capture, decode_protocol_select.value, channels, threshold, baud, int(decode_mode_select.value))
+        except Exception as e:
+            print("Error decoding:", e)
+            ui.notify(f"Error decoding: {e}")
+            return
+        elapsed = time.perf_counter() - started
+        if not live_view:
+            render_capture_view()
+        ui.notify(f"{len(decoded_symbols)} symbols decoded in {elapsed:.2f} s")
+
+def clear_decode():
+    """Removes the decoded symbols from the capture view."""
+    global decoded_symbols
+    decoded_symbols = np.zeros(0, dtype=SYMBOL_DTYPE)
+    if not live_view and capture_pyramids:
+        render_capture_view()
+
+# --- Acquisition worker processes ---
+
+class FrameRing:
+    """
+    Single-writer ring of variable-size frames in shared memory. The header holds the
+    sequence number of the last published frame and every slot holds its own sequence
+    number, the payload length and the payload: readers take zero-copy views and check
+    afterwards with valid() that the writer has not reused the slot meanwhile.
+    """
+
+    HEADER_SIZE = 16
+    SLOT_HEADER_SIZE = 16
+
+    def __init__(self, slots, slot_size, name=None):
+        self.slots = slots
+        self.slot_size = slot_size
+        stride = self.SLOT_HEADER_SIZE + slot_size
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.HEADER_SIZE + slots * stride)
         else:
-            try:
-                await asyncio.to_thread(send_command_to_scope, ":CHANnel2:DISPlay ON")
-                channel2_state = True
-                button.props['class'] = "button-size button-ch2"
-                button.update()
-            except Exception as e:
-                print("Error turning CH2 on:", e)
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.header = np.ndarray((1,), dtype=np.uint64, buffer=self.shm.buf)
+        # Per slot: (sequence number, payload length)
+        self.slot_headers = np.ndarray((slots, 2), dtype=np.uint64, buffer=self.shm.buf,
+                                       offset=self.HEADER_SIZE, strides=(stride, 8))
+
+    def payload_offset(self, slot):
+        """Returns the offset of the payload of a slot in the shared memory."""
+        return self.HEADER_SIZE + slot * (self.SLOT_HEADER_SIZE + self.slot_size) + self.SLOT_HEADER_SIZE
+
+    def sequence(self):
+        """Returns the sequence number of the last published frame (0 if none)."""
+        return int(self.header[0])
+
+    def publish(self, *parts):
+        """Writes the concatenation of the given buffers as the next frame."""
+        views = [memoryview(part).cast('B') for part in parts]
+        length = sum(view.nbytes for view in views)
+        if length > self.slot_size:
+            raise ValueError(f"Frame of {length} bytes does not fit a {self.slot_size} bytes slot")
+        sequence = self.sequence() + 1
+        slot = sequence % self.slots
+        self.slot_headers[slot, 0] = 0  # Invalid while being written
+        offset = self.payload_offset(slot)
+        for view in views:
+            self.shm.buf[offset:offset + view.nbytes] = view
+            offset += view.nbytes
+        self.slot_headers[slot, 1] = length
+        self.slot_headers[slot, 0] = sequence
+        self.header[0] = sequence
+
+    def read(self, sequence):
+        """Returns a zero-copy view of the given frame, or None if it is no longer available."""
+        slot = sequence % self.slots
+        if sequence <= 0 or int(self.slot_headers[slot, 0]) != sequence:
+            return None
+        offset = self.payload_offset(slot)
+        return self.shm.buf[offset:offset + int(self.slot_headers[slot, 1])]
+
+    def valid(self, sequence):
+        """Tells whether the given frame is still in the ring (views taken from it are intact)."""
+        return int(self.slot_headers[sequence % self.slots, 0]) == sequence
+
+    def close(self, unlink=False):
+        """Detaches from the shared memory; the creator also unlinks it."""
+        del self.header, self.slot_headers
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Views handed to readers are still alive; released at exit.
+        if unlink:
+            self.shm.unlink()
+
+def pack_waveforms(waveforms):
+    """Returns the buffers of a waveform frame: header size, JSON header (preambles) and samples."""
+    header, offset = {}, 0
+    for channel, (preamble, samples) in waveforms.items():
+        header[channel] = dict(preamble, offset=offset, length=len(samples))
+        offset += len(samples)
+    encoded = json.dumps(header).encode()
+    return [len(encoded).to_bytes(4, "little"), encoded, *(samples for _, samples in waveforms.values())]
+
+def unpack_waveforms(data):
+    """Returns the waveform frame in data as channel -> (preamble, zero-copy uint8 view)."""
+    size = int.from_bytes(data[:4], "little")
+    header = json.loads(bytes(data[4:4 + size]))
+    base = 4 + size
+    return {
+        int(channel): (preamble, np.frombuffer(data, dtype=np.uint8, count=preamble["length"], offset=base + preamble["offset"]))
+        for channel, preamble in header.items()
+    }
+
+def acquisition_worker(ip, port, png_ring_name, wave_ring_name, enabled, single_shot, pause, idle, stop):
+    """
+    Acquisition loop of one instrument in its own process: fetches and encodes the screen
+    image or, while single_shot is set, single-trigger frames of the enabled channels, and
+    publishes them into the shared-memory rings until stop is set. While pause is set the
+    loop acknowledges with idle and leaves the instrument alone.
+    """
+    global selected_ip, selected_port
+    selected_ip, selected_port = ip, port
+    pngs = FrameRing(PNG_RING_SLOTS, PNG_SLOT_SIZE, png_ring_name)
+    waves = FrameRing(WAVE_RING_SLOTS, WAVE_SLOT_SIZE, wave_ring_name)
+    delay = 1
+    while not stop.is_set():
+        if pause.is_set():
+            idle.set()
+            stop.wait(0.05)
+            continue
+        channels = [channel for channel in range(1, MAX_CHANNELS + 1) if enabled[channel - 1]]
+        try:
+            if single_shot.is_set():
+                frame = acquire_single_frame(channels) if channels else None
+                if frame:
+                    waves.publish(*pack_waveforms(frame))
+            else:
+                pngs.publish(convert_png_data_to_data_url(get_png_image()).encode())
+                # Screen images nobody reads would only compete with the control commands.
+                stop.wait(PNG_PUBLISH_INTERVAL)
+            delay = 1
+        except Exception as e:
+            print(f"Acquisition worker error: {e}; retrying in {delay} s")
+            stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+    pngs.close()
+    waves.close()
+
+def update_worker_channels():
+    """Shares the enabled channels with the acquisition worker process."""
+    if worker_channels is None:
+        return
+    for channel in range(1, MAX_CHANNELS + 1):
+        worker_channels[channel - 1] = bool(channel_states.get(channel))
+
+def start_acquisition_worker():
+    """Starts the acquisition worker process of the connected instrument and its rings."""
+    global acquisition_process, png_ring, wave_ring, worker_stop, worker_single_shot, worker_channels, worker_pause, worker_idle
+    context = multiprocessing.get_context("spawn")
+    png_ring = FrameRing(PNG_RING_SLOTS, PNG_SLOT_SIZE)
+    wave_ring = FrameRing(WAVE_RING_SLOTS, WAVE_SLOT_SIZE)
+    worker_stop = context.Event()
+    worker_single_shot = context.Event()
+    worker_pause = context.Event()
+    worker_idle = context.Event()
+    worker_channels = context.Array('b', MAX_CHANNELS, lock=False)
+    update_worker_channels()
+    acquisition_process = context.Process(
+        target=acquisition_worker,
+        args=(selected_ip, selected_port, png_ring.shm.name, wave_ring.shm.name,
+              worker_channels, worker_single_shot, worker_pause, worker_idle, worker_stop),
+        daemon=True,
+    )
+    acquisition_process.start()
+
+@contextlib.asynccontextmanager
+async def worker_paused():
+    """
+    Pauses the acquisition worker process, if any, while the web process changes the
+    instrument-wide waveform settings (:WAVeform:MODE, :SOURce, :STARt, :STOP).
+    """
+    if acquisition_process is None or not acquisition_process.is_alive():
+        yield
+        return
+    # Clear the acknowledgement first, so that a stale one from a previous pause is not trusted.
+    worker_idle.clear()
+    worker_pause.set()
+    try:
+        deadline = time.monotonic() + IO_TRANSFER_DEADLINE
+        while not worker_idle.is_set():
+            if time.monotonic() > deadline:
+                raise InstrumentIOError("Acquisition worker did not pause")
+            await asyncio.sleep(0.01)
+        yield
+    finally:
+        worker_pause.clear()
+
+def stop_acquisition_worker():
+    """Stops the acquisition worker process, if any, and releases its rings."""
+    global acquisition_process
+    if acquisition_process is None:
+        return
+    worker_stop.set()
+    acquisition_process.join(timeout=5)
+    if acquisition_process.is_alive():
+        acquisition_process.terminate()
+    acquisition_process = None
+    png_ring.close(unlink=True)
+    wave_ring.close(unlink=True)
+
+def acquisition_worker_died():
+    """Releases the rings of a dead acquisition worker process and falls back to in-process polling."""
+    global worker_failure
+    worker_failure = f"Acquisition worker died (exit code {acquisition_process.exitcode}), polling in-process"
+    print(worker_failure)
+    stop_acquisition_worker()
+    set_connection_state(scope_io.state)
+    with display_container:
+        ui.notify(worker_failure)
 
 # --- User Interface (UI) definition ---
 
@@ -620,6 +1913,7 @@ with connection_card:
     ui.label("Oscilloscope Connection")
     ip_input = ui.input(label="IP Address", placeholder="e.g. 192.168.212.202")
     port_input = ui.input(label="Port", placeholder="e.g. 5555")
+    worker_process_checkbox = ui.checkbox("Acquire in a worker process").tooltip('Fetch and encode frames in a separate process to spare the web server')
     connection_status = ui.label("")
     connect_button = ui.button("Connect")
 
@@ -633,22 +1927,28 @@ with display_container:
     main_row = ui.row().classes("items-start")  # Align at the top
     with main_row:
         instrument_label = ui.label("").style("color: yellow; white-space: pre-line; margin-top: 20px;")
+        connection_state_label = ui.label("").style("white-space: pre-line; margin-top: 20px;")
         # Left side: Canvas container
         canvas_container = ui.column().style("flex: 1;")
         with canvas_container:
-            ui.html('''
-            <canvas id="myCanvas" width="800" height="480"
+            ui.html(f'''
+            <canvas id="myCanvas" width="{CANVAS_WIDTH}" height="{CANVAS_HEIGHT}"
                     style="display: block; background: #000;"></canvas>
             ''')
+            # Zoom and pan of the deep-memory capture (see CAPTURE)
+            with ui.row().style("gap: 10px;"):
+                ui.button("ZOOM +", on_click=lambda: zoom_capture(0.5)).classes("button-size button-grey")
+                ui.button("ZOOM -", on_click=lambda: zoom_capture(2)).classes("button-size button-grey")
+                ui.button("◀", on_click=lambda: pan_capture(-0.25)).classes("button-size button-grey")
+                ui.button("▶", on_click=lambda: pan_capture(0.25)).classes("button-size button-grey")
+                ui.button("LIVE", on_click=show_live).classes("button-size button-grey")
         # Right side: Grid of buttons/labels
         with ui.grid(columns=3).classes("gap-5"):
             # First row
             clear_button = ui.button("CLEAR").classes("button-size button-grey")
             auto_button = ui.button("AUTO").classes("button-size button-grey")
             run_stop_button = ui.button("RUN/STOP").classes("button-size button-red")  # Starts as STOP
-            # Second row
-            ch1_button = ui.button("CH1").classes("button-size button-grey")
-            ch2_button = ui.button("CH2").classes("button-size button-grey")
+            # Second row: time scale, time offset and trigger level
             with ui.dropdown_button('Time', auto_close=False).props(f'style="text-transform:none; color: black !important; background-color: {orange_rigol} !important;"').classes("button-size"):
                 with ui.dropdown_button('ns', auto_close=True).props(f'style="text-transform:none; color: black !important; background-color: {orange_rigol} !important;"'):
                     ui.item('5', on_click=lambda: (asyncio.create_task(set_time(0.000000005)), ui.notify('Time set to 5 ns')))
@@ -685,39 +1985,6 @@ with display_container:
                     ui.item('10', on_click=lambda: (asyncio.create_task(set_time(10)), ui.notify('Time set to 10 s')))
                     ui.item('20', on_click=lambda: (asyncio.create_task(set_time(20)), ui.notify('Time set to 20 s')))
                     ui.item('50', on_click=lambda: (asyncio.create_task(set_time(50)), ui.notify('Time set to 50 s')))
-            # Third row
-            with ui.dropdown_button('Scale CH1', auto_close=False).props(f'style="text-transform:none; color: black !important; background-color: {yellow_rigol} !important; padding-right: 0px;"').classes("button-size"):
-                with ui.dropdown_button('mV', auto_close=True).props(f'style="text-transform:none; color: black !important; background-color: {yellow_rigol} !important;"'):
-                    ui.item('1', on_click=lambda: (asyncio.create_task(set_voltage(0.001,1)), ui.notify('CH1 Scale set to 1 mV')))
-                    ui.item('2', on_click=lambda: (asyncio.create_task(set_voltage(0.002,1)), ui.notify('CH1 Scale set to 2 mV')))
-                    ui.item('5', on_click=lambda: (asyncio.create_task(set_voltage(0.005,1)), ui.notify('CH1 Scale set to 5 mV')))
-                    ui.item('10', on_click=lambda: (asyncio.create_task(set_voltage(0.01,1)), ui.notify('CH1 Scale set to 10 mV')))
-                    ui.item('20', on_click=lambda: (asyncio.create_task(set_voltage(0.02,1)), ui.notify('CH1 Scale set to 20 mV')))
-                    ui.item('50', on_click=lambda: (asyncio.create_task(set_voltage(0.05,1)), ui.notify('CH1 Scale set to 50 mV')))
-                    ui.item('100', on_click=lambda: (asyncio.create_task(set_voltage(0.1,1)), ui.notify('CH1 Scale set to 100 mV')))
-                    ui.item('200', on_click=lambda: (asyncio.create_task(set_voltage(0.2,1)), ui.notify('CH1 Scale set to 200 mV')))
-                    ui.item('500', on_click=lambda: (asyncio.create_task(set_voltage(0.5,1)), ui.notify('CH1 Scale set to 500 mV')))
-                with ui.dropdown_button('V', auto_close=True).props(f'style="text-transform:none; color: black !important; background-color: {yellow_rigol} !important;"'):
-                    ui.item('1', on_click=lambda: (asyncio.create_task(set_voltage(1,1)), ui.notify('CH1 Scale set to 1 V')))
-                    ui.item('2', on_click=lambda: (asyncio.create_task(set_voltage(2,1)), ui.notify('CH1 Scale set to 2 V')))
-                    ui.item('5', on_click=lambda: (asyncio.create_task(set_voltage(5,1)), ui.notify('CH1 Scale set to 5 V')))
-                    ui.item('10', on_click=lambda: (asyncio.create_task(set_voltage(10,1)), ui.notify('CH1 Scale set to 10 V')))
-            with ui.dropdown_button('Scale CH2', auto_close=False).props(f'style="text-transform:none; color: black !important; background-color: {blue_rigol} !important; padding-right: 0px;"').classes("button-size"):
-                with ui.dropdown_button('mV', auto_close=True).props(f'style="text-transform:none; color: black !important; background-color: {blue_rigol} !important;"'):
-                    ui.item('1', on_click=lambda: (asyncio.create_task(set_voltage(0.001,2)), ui.notify('CH2 Scale set to 1 mV')))
-                    ui.item('2', on_click=lambda: (asyncio.create_task(set_voltage(0.002,2)), ui.notify('CH2 Scale set to 2 mV')))
-                    ui.item('5', on_click=lambda: (asyncio.create_task(set_voltage(0.005,2)), ui.notify('CH2 Scale set to 5 mV')))
-                    ui.item('10', on_click=lambda: (asyncio.create_task(set_voltage(0.01,2)), ui.notify('CH2 Scale set to 10 mV')))
-                    ui.item('20', on_click=lambda: (asyncio.create_task(set_voltage(0.02,2)), ui.notify('CH2 Scale set to 20 mV')))
-                    ui.item('50', on_click=lambda: (asyncio.create_task(set_voltage(0.05,2)), ui.notify('CH2 Scale set to 50 mV')))
-                    ui.item('100', on_click=lambda: (asyncio.create_task(set_voltage(0.1,2)), ui.notify('CH2 Scale set to 100 mV')))
-                    ui.item('200', on_click=lambda: (asyncio.create_task(set_voltage(0.2,2)), ui.notify('CH2 Scale set to 200 mV')))
-                    ui.item('500', on_click=lambda: (asyncio.create_task(set_voltage(0.5,2)), ui.notify('CH2 Scale set to 500 mV')))
-                with ui.dropdown_button('V', auto_close=True).props(f'style="text-transform:none; color: black !important; background-color: {blue_rigol} !important;"'):
-                    ui.item('1', on_click=lambda: (asyncio.create_task(set_voltage(1,2)), ui.notify('CH2 Scale set to 1 V')))
-                    ui.item('2', on_click=lambda: (asyncio.create_task(set_voltage(2,2)), ui.notify('CH2 Scale set to 2 V')))
-                    ui.item('5', on_click=lambda: (asyncio.create_task(set_voltage(5,2)), ui.notify('CH2 Scale set to 5 V')))
-                    ui.item('10', on_click=lambda: (asyncio.create_task(set_voltage(10,2)), ui.notify('CH2 Scale set to 10 V')))
             with ui.column().style(f"gap: 10px; background-color: {orange_rigol}; border-radius: 4px; height: 40px;"):
                 ui.label('Time Offset').style('color: black; font-size: 0.8rem').classes("slider-size pt-2")
                 with ui.row().style("gap: 0"):
@@ -725,21 +1992,6 @@ with display_container:
                     offset_input = ui.input(value="").classes("middle-label").props('borderless').tooltip('Type time offset in seconds without unit')
                     offset_input.on('keyup', set_offset_manual)
                     ui.button('+', on_click=lambda: (asyncio.create_task(set_offset('+')))).style(f"background-color: {orange_rigol} !important;").classes("square-button")
-            # Fourth row
-            with ui.column().style(f"gap: 10px; background-color: {yellow_rigol}; border-radius: 4px; height: 40px;"):
-                ui.label('CH1 VOffset').style('color: black; font-size: 0.8rem').classes("slider-size pt-2")
-                with ui.row().style("gap: 0"):
-                    ui.button('-', on_click=lambda: (asyncio.create_task(set_voltage_offset('-', 1)))).style(f"background-color: {yellow_rigol} !important;").classes("square-button")
-                    pos_ch1_input = ui.input(value="").classes("middle-label").props('borderless').tooltip('Type voltage offset in volts without unit')
-                    pos_ch1_input.on('keyup', set_ch1_voltage_offset_manual)
-                    ui.button('+', on_click=lambda: (asyncio.create_task(set_voltage_offset('+', 1)))).style(f"background-color: {yellow_rigol} !important;").classes("square-button")
-            with ui.column().style(f"gap: 10px; background-color: {blue_rigol}; border-radius: 4px; height: 40px;"):
-                ui.label('CH2 VOffset').style('color: black; font-size: 0.8rem').classes("slider-size pt-2")
-                with ui.row().style("gap: 0"):
-                    ui.button('-', on_click=lambda: (asyncio.create_task(set_voltage_offset('-', 2)))).style(f"background-color: {blue_rigol} !important;").classes("square-button")
-                    pos_ch2_input = ui.input(value="").classes("middle-label").props('borderless').tooltip('Type voltage offset in volts without unit')
-                    pos_ch2_input.on('keyup', set_ch2_voltage_offset_manual)
-                    ui.button('+', on_click=lambda: (asyncio.create_task(set_voltage_offset('+', 2)))).style(f"background-color: {blue_rigol} !important;").classes("square-button")
             with ui.column().style(f"gap: 10px; background-color: {orange_rigol}; border-radius: 4px; height: 40px;"):
                 ui.label('Trigger').style('color: black; font-size: 0.8rem').classes("slider-size pt-2")
                 with ui.row().style("gap: 0"):
@@ -747,39 +1999,46 @@ with display_container:
                     trigger_input = ui.input(value="").classes("middle-label").props('borderless').tooltip('Type voltage offset in volts without unit')
                     trigger_input.on('keyup', set_trigger_manual)
                     ui.button('+', on_click=lambda: (asyncio.create_task(set_trigger('+')))).style(f"background-color: {orange_rigol} !important;").classes("square-button")
+            # One row per channel: toggle, vertical scale and vertical offset
+            for channel in range(1, MAX_CHANNELS + 1):
+                build_channel_controls(channel)
         with ui.row().classes('items-center').style('gap: 136px;'):
             with ui.grid(columns=5).classes("gap-4"):
-                with ui.column():
-                    ui.label('CH1 Freq').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch1_freq = ui.label('').style('color: white; font-size: 0.8rem').classes("meas1-size")
-                with ui.column():
-                    ui.label('CH1 Period').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch1_period = ui.label('').style('color: white; font-size: 0.8rem').classes("meas1-size")
-                with ui.column():
-                    ui.label('CH1 V Min').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch1_vmin = ui.label('').style('color: white; font-size: 0.8rem').classes("meas1-size")
-                with ui.column():
-                    ui.label('CH1 V Max').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch1_vmax = ui.label('').style('color: white; font-size: 0.8rem').classes("meas1-size")
-                with ui.column():
-                    ui.label('CH1 +Duty').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch1_pduty = ui.label('').style('color: white; font-size: 0.8rem').classes("meas1-size")
-                with ui.column():
-                    ui.label('CH2 Freq').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch2_freq = ui.label('').style('color: white; font-size: 0.8rem').classes("meas2-size")
-                with ui.column():
-                    ui.label('CH2 Period').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch2_period = ui.label('').style('color: white; font-size: 0.8rem').classes("meas2-size")
-                with ui.column():
-                    ui.label('CH2 V Min').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch2_vmin = ui.label('').style('color: white; font-size: 0.8rem').classes("meas2-size")
-                with ui.column():
-                    ui.label('CH2 V Max').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch2_vmax = ui.label('').style('color: white; font-size: 0.8rem').classes("meas2-size")
-                with ui.column():
-                    ui.label('CH2 +Duty').style('color: white; font-size: 0.8rem').classes("slider-size")
-                    meas_ch2_pduty = ui.label('').style('color: white; font-size: 0.8rem').classes("meas2-size")
-            measure_button = ui.button("MEASURE").classes("button-size button-grey")
+                for channel in range(1, MAX_CHANNELS + 1):
+                    build_channel_measurements(channel)
+            with ui.column():
+                measure_button = ui.button("MEASURE").classes("button-size button-grey")
+                capture_button = ui.button("CAPTURE").classes("button-size button-grey")
+        # Setup snapshots: save the whole instrument setup under a name and restore it in one transfer.
+        with ui.row().classes('items-center').style('gap: 20px;'):
+            setup_name_input = ui.input(label="Setup name").props('dark dense')
+            save_setup_button = ui.button("SAVE SETUP").classes("button-size button-grey")
+            setup_select = ui.select(saved_setup_names(), label="Saved setups").props('dark dense').style('min-width: 200px;')
+            restore_setup_button = ui.button("RESTORE").classes("button-size button-grey")
+        # Mask test: golden waveform plus tolerance, checked on every single-trigger acquisition.
+        with ui.row().classes('items-center').style('gap: 20px;'):
+            mask_tolerance_input = ui.input(label="Mask tolerance (V)", value="0.1").props('dark dense').style('width: 130px;')
+            mask_time_tolerance_input = ui.input(label="Time tolerance (points)", value="0").props('dark dense').style('width: 150px;')
+            golden_button = ui.button("SET GOLDEN").classes("button-size button-grey")
+            mask_button = ui.button("MASK TEST").classes("button-size button-grey")
+            mask_stats_label = ui.label("").style("color: white;")
+            ui.timer(0.5, update_mask_display)
+        # Protocol decoding of the deep-memory capture, shown as an overlay on the canvas.
+        with ui.row().classes('items-center').style('gap: 20px;'):
+            channel_options = {None: "-", **{channel: f"CH{channel}" for channel in range(1, MAX_CHANNELS + 1)}}
+            decode_protocol_select = ui.select(["UART", "I2C", "SPI"], value="UART", label="Protocol").props('dark dense').style('width: 90px;')
+            decode_data_select = ui.select(channel_options, value=1, label="RX/SDA/MOSI").props('dark dense').style('width: 110px;')
+            decode_clock_select = ui.select(channel_options, value=None, label="SCL/SCLK").props('dark dense').style('width: 90px;')
+            decode_miso_select = ui.select(channel_options, value=None, label="MISO").props('dark dense').style('width: 70px;')
+            decode_cs_select = ui.select(channel_options, value=None, label="CS").props('dark dense').style('width: 70px;')
+            decode_mode_select = ui.select(["0", "1", "2", "3"], value="0", label="SPI mode").props('dark dense').style('width: 80px;')
+            decode_baud_input = ui.input(label="Baud", value="9600").props('dark dense').style('width: 80px;')
+            decode_threshold_input = ui.input(label="Threshold (V)", value="").props('dark dense').style('width: 100px;').tooltip('Leave empty for the signal midpoint')
+            decode_button = ui.button("DECODE").classes("button-size button-grey")
+            clear_decode_button = ui.button("CLEAR DEC").classes("button-size button-grey")
+
+# Only the channels of the connected instrument are shown (updated on connection)
+show_channels()
 
 # Loading overlay
 loading_overlay = ui.column().style(
@@ -796,9 +2055,16 @@ connect_button.on("click", lambda: asyncio.create_task(on_connect()))
 clear_button.on("click", lambda: asyncio.create_task(send_command(":CLEAR")))
 auto_button.on("click", lambda: asyncio.create_task(auto_action()))
 run_stop_button.on("click", lambda: asyncio.create_task(toggle_run_stop()))
-ch1_button.on("click", lambda: asyncio.create_task(toggle_channel(1, ch1_button)))
-ch2_button.on("click", lambda: asyncio.create_task(toggle_channel(2, ch2_button)))
 measure_button.on("click", lambda: asyncio.create_task(measurement()))
+capture_button.on("click", lambda: asyncio.create_task(capture()))
+save_setup_button.on("click", lambda: asyncio.create_task(save_setup()))
+restore_setup_button.on("click", lambda: asyncio.create_task(restore_setup()))
+golden_button.on("click", lambda: asyncio.create_task(set_golden()))
+mask_button.on("click", toggle_mask_test)
+decode_button.on("click", lambda: asyncio.create_task(decode()))
+clear_decode_button.on("click", clear_decode)
+
+app.on_shutdown(stop_acquisition_worker)
 
 ui.run(title="Rigol Remote", port=12022)
 